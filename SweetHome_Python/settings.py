@@ -130,6 +130,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# 用户上传文件
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -137,6 +141,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
+# 文章正文超过该字节数时使用 zlib 压缩存储
+ARTICLE_CONTENT_COMPRESS_THRESHOLD = 1024
+
+# 文章历史版本每隔多少个版本保存一次完整快照
+ARTICLE_REVISION_SNAPSHOT_INTERVAL = 10
+
+# 头像上传大小上限（字节）、缩略图尺寸（像素）以及生成缩略图的进程数
+AVATAR_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+# 头像图片的最大像素数，避免解码体积小但尺寸巨大的图片时耗尽内存
+AVATAR_MAX_PIXELS = 4096 * 4096
+AVATAR_THUMBNAIL_SIZES = (64, 128, 256)
+AVATAR_THUMBNAIL_WORKERS = 2
+# 缩略图文件名包含内容哈希，可以长期缓存
+AVATAR_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
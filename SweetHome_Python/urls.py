@@ -18,6 +18,8 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
+from users.views import avatar_thumbnail
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -25,6 +27,8 @@ urlpatterns = [
 
     path('api/articles/', include('articles.urls'), name='articles'),
 
+    path('media/avatars/thumbnails/<path:path>', avatar_thumbnail, name='avatar-thumbnail'),
+
     path('doc/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('doc/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('doc/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc')
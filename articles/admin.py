@@ -1,4 +1,30 @@
+from django import forms
 from django.contrib import admin
-from .models import Article
+from .models import Article, ArticleRevision
 # Register your models here.
-admin.site.register(Article)
\ No newline at end of file
+
+
+class ArticleAdminForm(forms.ModelForm):
+    # 正文存放在 ArticleContent 中，通过 Article.text / set_text 读写
+    content = forms.CharField(widget=forms.Textarea)
+
+    class Meta:
+        model = Article
+        fields = ('title', 'author')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['content'].initial = self.instance.text
+
+
+@admin.register(Article)
+class ArticleAdmin(admin.ModelAdmin):
+    form = ArticleAdminForm
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.set_text(form.cleaned_data['content'])
+
+
+admin.site.register(ArticleRevision)
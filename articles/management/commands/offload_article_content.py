@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from articles.models import Article, ArticleContent, encode_content
+
+
+class Command(BaseCommand):
+    help = '将 Article.content 中的旧正文分块迁移到 ArticleContent 表，并置空旧列'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size must be positive')
+
+        queryset = Article.objects.filter(content__isnull=False).order_by('pk').values_list('id', 'content')
+        last_id = 0
+        migrated = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_id)[:chunk_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            ids = [article_id for article_id, _ in rows]
+
+            with transaction.atomic():
+                # 已有 ArticleContent 的文章以新表为准，命令可以重复执行
+                existing = set(ArticleContent.objects.filter(article_id__in=ids)
+                               .values_list('article_id', flat=True))
+                bodies = []
+                for article_id, content in rows:
+                    if article_id in existing:
+                        continue
+                    codec, data = encode_content(content)
+                    bodies.append(ArticleContent(article_id=article_id, codec=codec, data=data))
+                ArticleContent.objects.bulk_create(bodies, ignore_conflicts=True)
+                Article.objects.filter(pk__in=ids).update(content=None)
+
+            migrated += len(bodies)
+            self.stdout.write('Migrated %d articles (up to id %d)' % (migrated, last_id))
+
+        self.stdout.write(self.style.SUCCESS('Done, %d articles migrated' % migrated))
@@ -1,9 +1,18 @@
+import zlib
+
+from django.conf import settings
 from django.db import models
 
+# 超过该长度（字节）的正文会被 zlib 压缩后存储
+CONTENT_COMPRESS_THRESHOLD = getattr(settings, 'ARTICLE_CONTENT_COMPRESS_THRESHOLD', 1024)
+
+
 # Create your models here.
 class Article(models.Model):
     title = models.CharField(max_length=50)
-    content = models.TextField()
+    # 旧的内联正文列，仅用于迁移：offload_article_content 将其移入 ArticleContent 后置空，
+    # 全部迁移完成后再删除该字段
+    content = models.TextField(null=True, blank=True, editable=False)
     created_time = models.DateTimeField(auto_now_add=True)
     updated_time = models.DateTimeField(auto_now=True)
     author = models.ForeignKey('users.User', on_delete=models.CASCADE)
@@ -14,4 +23,98 @@ class Article(models.Model):
     view_count = models.IntegerField(default=0)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+    # 正文单独存放在 ArticleContent 中，只有访问时才会查询，尚未迁移的文章读取旧的 content 列
+    @property
+    def text(self):
+        try:
+            return self.body.get_text()
+        except ArticleContent.DoesNotExist:
+            return self.content or ''
+
+    def set_text(self, text):
+        try:
+            body = self.body
+        except ArticleContent.DoesNotExist:
+            body = ArticleContent(article=self)
+        body.set_text(text)
+        body.save()
+        if self.content is not None:
+            Article.objects.filter(pk=self.pk).update(content=None)
+            self.content = None
+
+
+class ArticleContent(models.Model):
+    CODEC_PLAIN = 'plain'
+    CODEC_ZLIB = 'zlib'
+    CODEC_CHOICES = [
+        (CODEC_PLAIN, 'plain'),
+        (CODEC_ZLIB, 'zlib'),
+    ]
+
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name='body')
+    codec = models.CharField(max_length=10, choices=CODEC_CHOICES, default=CODEC_PLAIN)
+    data = models.BinaryField()
+
+    def get_text(self):
+        return decode_content(self.codec, self.data)
+
+    def set_text(self, text):
+        self.codec, self.data = encode_content(text)
+
+
+class ArticleRevision(models.Model):
+    """
+    文章正文的历史版本，is_snapshot 为 True 时 data 是完整正文，否则是相对上一版本的差异，
+    两者均经过 encode_content 编码，重建方式见 articles/revisions.py
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    is_snapshot = models.BooleanField(default=False)
+    codec = models.CharField(max_length=10, choices=ArticleContent.CODEC_CHOICES, default=ArticleContent.CODEC_PLAIN)
+    data = models.BinaryField()
+    length = models.IntegerField(default=0)
+    editor = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True)
+    created_time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['number']
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'number'], name='unique_article_revision_number'),
+        ]
+
+    def __str__(self):
+        return '%s #%d' % (self.article_id, self.number)
+
+
+def encode_content(text):
+    raw = text.encode('utf-8')
+    if len(raw) > CONTENT_COMPRESS_THRESHOLD:
+        compressed = zlib.compress(raw)
+        # 压缩收益不明显时仍保存原文
+        if len(compressed) < len(raw):
+            return ArticleContent.CODEC_ZLIB, compressed
+    return ArticleContent.CODEC_PLAIN, raw
+
+
+def decode_content(codec, data):
+    data = bytes(data)
+    if codec == ArticleContent.CODEC_ZLIB:
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
+
+
+def load_contents(article_ids):
+    """
+    批量读取正文，返回 {article_id: text}，与 Article.text 一致：尚未迁移的文章读取旧的 content 列，没有正文时为空字符串
+    """
+    rows = ArticleContent.objects.filter(article_id__in=article_ids).values_list('article_id', 'codec', 'data')
+    contents = {article_id: decode_content(codec, data) for article_id, codec, data in rows}
+
+    missing = [article_id for article_id in article_ids if article_id not in contents]
+    if missing:
+        legacy = dict(Article.objects.filter(pk__in=missing).values_list('id', 'content'))
+        for article_id in missing:
+            contents[article_id] = legacy.get(article_id) or ''
+    return contents
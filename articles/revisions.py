@@ -0,0 +1,85 @@
+import json
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+
+from articles.models import Article, ArticleRevision, decode_content, encode_content
+
+# 每隔多少个版本保存一次完整快照，重建任意版本最多需要应用 SNAPSHOT_INTERVAL - 1 个差异
+SNAPSHOT_INTERVAL = getattr(settings, 'ARTICLE_REVISION_SNAPSHOT_INTERVAL', 10)
+
+
+# 差异以行为单位：[start, end] 表示复制上一版本的第 start 到 end 行，字符串表示新插入的文本
+def make_delta(old, new):
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif tag in ('replace', 'insert'):
+            ops.append(''.join(new_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(old, ops):
+    old_lines = old.splitlines(keepends=True)
+    return ''.join(''.join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def _decode(revision):
+    return decode_content(revision.codec, revision.data)
+
+
+def get_revision_text(article, number):
+    """
+    从最近的快照开始依次应用差异，重建第 number 个版本的正文，版本不存在时返回 None
+    """
+    snapshot = (article.revisions.filter(number__lte=number, is_snapshot=True)
+                .order_by('-number').first())
+    if snapshot is None:
+        return None
+
+    deltas = list(article.revisions.filter(number__gt=snapshot.number, number__lte=number).order_by('number'))
+    if snapshot.number + len(deltas) != number:
+        return None
+
+    text = _decode(snapshot)
+    for revision in deltas:
+        text = apply_delta(text, json.loads(_decode(revision)))
+    return text
+
+
+def record_revision(article, content, editor=None):
+    """
+    记录一个新版本，正文与上一版本相同时不记录
+    """
+    with transaction.atomic():
+        # 锁住文章行，避免并发编辑产生重复的版本号
+        Article.objects.select_for_update().filter(pk=article.pk).first()
+        last = article.revisions.order_by('-number').first()
+
+        number = 1
+        data = None
+        if last is not None:
+            previous = get_revision_text(article, last.number)
+            if previous == content:
+                return None
+            number = last.number + 1
+            if previous is not None and (number - 1) % SNAPSHOT_INTERVAL != 0:
+                delta = json.dumps(make_delta(previous, content), ensure_ascii=False, separators=(',', ':'))
+                # 差异比完整正文还大时直接保存快照
+                if len(delta) < len(content):
+                    data = delta
+
+        is_snapshot = data is None
+        codec, encoded = encode_content(content if is_snapshot else data)
+        return ArticleRevision.objects.create(article=article,
+                                              number=number,
+                                              is_snapshot=is_snapshot,
+                                              codec=codec,
+                                              data=encoded,
+                                              length=len(content),
+                                              editor=editor)
@@ -1,9 +1,31 @@
+from django.db import transaction
 from rest_framework import serializers
 
-from articles.models import Article
+from articles.models import Article, ArticleRevision
+
+
+class ArticleListSerializer(serializers.ModelSerializer):
+    """
+    文章列表只返回元数据，正文仅在获取详情时加载
+    """
+    class Meta:
+        model = Article
+        fields = ('id',
+                  'title',
+                  'created_time',
+                  'updated_time',
+                  'author',
+                  'like_count',
+                  'dislike_count',
+                  'star_count',
+                  'comment_count',
+                  'view_count')
+        read_only_fields = fields
 
 
 class ArticleSerializer(serializers.ModelSerializer):
+    content = serializers.CharField(source='text')
+
     class Meta:
         model = Article
         fields = ('id',
@@ -27,6 +49,39 @@ class ArticleSerializer(serializers.ModelSerializer):
                             'comment_count',
                             'view_count')
 
-        def create(self, validated_data):
-            validated_data['author'] = self.context['request'].user
-            return Article.objects.create(**validated_data)
\ No newline at end of file
+    # 正文存放在 ArticleContent 中，需要与文章一起写入
+    def create(self, validated_data):
+        text = validated_data.pop('text')
+        with transaction.atomic():
+            article = super().create(validated_data)
+            article.set_text(text)
+        return article
+
+    def update(self, instance, validated_data):
+        text = validated_data.pop('text', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if text is not None:
+                instance.set_text(text)
+        return instance
+
+
+class ArticleRevisionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArticleRevision
+        fields = ('number',
+                  'length',
+                  'editor',
+                  'created_time')
+        read_only_fields = fields
+
+
+class ArticleRevisionDetailSerializer(ArticleRevisionSerializer):
+    content = serializers.SerializerMethodField()
+
+    class Meta(ArticleRevisionSerializer.Meta):
+        fields = ArticleRevisionSerializer.Meta.fields + ('content',)
+        read_only_fields = fields
+
+    def get_content(self, obj):
+        return self.context['content']
@@ -0,0 +1,14 @@
+from django.dispatch import receiver
+
+from articles.revisions import record_revision
+from common.signals import UserSignals
+
+
+@receiver(UserSignals.on_user_article_created)
+@receiver(UserSignals.on_user_article_updated)
+def handle_article_saved(sender, instance, article=None, *args, **kwargs):
+    # sender=self.__class__,instance=self.request.user,article=serializer.instance self=ArticleViewSet
+    # 记录文章正文的新版本
+    if article is None:
+        return
+    record_revision(article, article.text, editor=instance)
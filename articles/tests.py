@@ -1,3 +1,203 @@
-from django.test import TestCase
+import io
+import random
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from articles.models import (CONTENT_COMPRESS_THRESHOLD, Article, ArticleContent, decode_content, encode_content,
+                             load_contents)
+from articles.revisions import apply_delta, get_revision_text, make_delta, record_revision
+from articles.serializers import ArticleSerializer
+from common.signals import UserSignals
+from users.models import User
+
 
 # Create your tests here.
+class ContentCodecTests(SimpleTestCase):
+    def test_short_content_is_plain(self):
+        text = 'a' * CONTENT_COMPRESS_THRESHOLD
+        codec, data = encode_content(text)
+        self.assertEqual(codec, ArticleContent.CODEC_PLAIN)
+        self.assertEqual(decode_content(codec, data), text)
+
+    def test_long_content_is_compressed(self):
+        text = '正文' * CONTENT_COMPRESS_THRESHOLD
+        codec, data = encode_content(text)
+        self.assertEqual(codec, ArticleContent.CODEC_ZLIB)
+        self.assertLess(len(data), len(text.encode('utf-8')))
+        self.assertEqual(decode_content(codec, memoryview(data)), text)
+
+    @mock.patch('articles.models.zlib.compress', side_effect=lambda data: data + b'\0')
+    def test_incompressible_content_stays_plain(self, compress):
+        text = 'a' * (CONTENT_COMPRESS_THRESHOLD + 1)
+        self.assertEqual(encode_content(text), (ArticleContent.CODEC_PLAIN, text.encode('utf-8')))
+
+
+class ArticleContentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author', password='password')
+
+    def test_legacy_content_fallback(self):
+        legacy = Article.objects.create(title='legacy', author=self.user, content='old body')
+        empty = Article.objects.create(title='empty', author=self.user)
+        self.assertEqual(legacy.text, 'old body')
+        self.assertEqual(empty.text, '')
+        self.assertEqual(load_contents([legacy.pk, empty.pk]), {legacy.pk: 'old body', empty.pk: ''})
+
+    def test_set_text_clears_legacy_content(self):
+        article = Article.objects.create(title='legacy', author=self.user, content='old body')
+        article.set_text('new body')
+        article = Article.objects.get(pk=article.pk)
+        self.assertIsNone(article.content)
+        self.assertEqual(article.text, 'new body')
+        self.assertEqual(load_contents([article.pk]), {article.pk: 'new body'})
+
+    def test_serializer_create_and_update(self):
+        serializer = ArticleSerializer(data={'title': 'title', 'content': 'body'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        article = serializer.save(author=self.user)
+        self.assertEqual(Article.objects.get(pk=article.pk).text, 'body')
+
+        serializer = ArticleSerializer(article, data={'title': 'renamed'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        article = Article.objects.get(pk=article.pk)
+        self.assertEqual((article.title, article.text), ('renamed', 'body'))
+
+        serializer = ArticleSerializer(article, data={'content': 'new body'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(Article.objects.get(pk=article.pk).text, 'new body')
+        self.assertEqual(serializer.data['content'], 'new body')
+
+    def test_offload_command(self):
+        articles = [Article.objects.create(title='t%d' % i, author=self.user, content='body %d' % i)
+                    for i in range(5)]
+        # 已经存在 ArticleContent 的文章以新表为准
+        ArticleContent.objects.create(article=articles[0], codec=ArticleContent.CODEC_PLAIN, data=b'current')
+
+        call_command('offload_article_content', chunk_size=2, stdout=io.StringIO())
+        self.assertFalse(Article.objects.filter(content__isnull=False).exists())
+        self.assertEqual(load_contents([article.pk for article in articles]),
+                         {article.pk: 'current' if i == 0 else 'body %d' % i for i, article in enumerate(articles)})
+
+        # 重复执行不会产生任何变化
+        out = io.StringIO()
+        call_command('offload_article_content', chunk_size=2, stdout=out)
+        self.assertIn('0 articles migrated', out.getvalue())
+        self.assertEqual(ArticleContent.objects.count(), 5)
+
+
+class DeltaTests(SimpleTestCase):
+    def test_round_trip(self):
+        rng = random.Random(0)
+        pieces = ['a\n', 'b\n', 'c', '\r\n', 'd ', '中文\n']
+        for _ in range(200):
+            old = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+            new = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+            self.assertEqual(apply_delta(old, make_delta(old, new)), new)
+
+    def test_unchanged_lines_are_copied(self):
+        self.assertEqual(make_delta('a\nb\nc\n', 'a\nx\nc\n'), [[0, 1], 'x\n', [2, 3]])
+
+
+@mock.patch('articles.revisions.SNAPSHOT_INTERVAL', 3)
+class RevisionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author', password='password')
+        self.article = Article.objects.create(title='title', author=self.user)
+        self.base = ''.join('line %d\n' % i for i in range(50))
+
+    def edit(self, i):
+        return self.base + 'edit %d\n' % i
+
+    def test_first_revision_is_snapshot(self):
+        revision = record_revision(self.article, self.base, editor=self.user)
+        self.assertEqual(revision.number, 1)
+        self.assertTrue(revision.is_snapshot)
+
+    def test_unchanged_content_is_not_recorded(self):
+        record_revision(self.article, self.base)
+        self.assertIsNone(record_revision(self.article, self.base))
+        self.assertEqual(self.article.revisions.count(), 1)
+
+    def test_snapshot_interval(self):
+        for i in range(7):
+            record_revision(self.article, self.edit(i))
+        self.assertEqual(list(self.article.revisions.filter(is_snapshot=True).values_list('number', flat=True)),
+                         [1, 4, 7])
+
+    def test_large_delta_falls_back_to_snapshot(self):
+        record_revision(self.article, self.base)
+        revision = record_revision(self.article, 'completely different\n')
+        self.assertTrue(revision.is_snapshot)
+        self.assertEqual(get_revision_text(self.article, 2), 'completely different\n')
+
+    def test_reconstruction_across_snapshots(self):
+        for i in range(8):
+            record_revision(self.article, self.edit(i))
+        for i in range(8):
+            self.assertEqual(get_revision_text(self.article, i + 1), self.edit(i))
+
+    def test_missing_revision(self):
+        record_revision(self.article, self.base)
+        self.assertIsNone(get_revision_text(self.article, 2))
+
+
+class RevisionEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='author', password='password')
+        self.client.force_authenticate(self.user)
+
+    def create_article(self, content):
+        response = self.client.post('/api/articles/', {'title': 'title', 'content': content}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Article.objects.get(pk=response.data['id'])
+
+    def test_update_sends_signal_and_records_revision(self):
+        article = self.create_article('first\n')
+        handler = mock.Mock()
+        UserSignals.on_user_article_updated.connect(handler)
+        self.addCleanup(UserSignals.on_user_article_updated.disconnect, handler)
+
+        response = self.client.put('/api/articles/%d/' % article.pk, {'title': 'title', 'content': 'second\n'},
+                                   format='json')
+        self.assertEqual(response.status_code, 200)
+        handler.assert_called_once()
+        self.assertEqual(handler.call_args.kwargs['article'].pk, article.pk)
+        self.assertEqual(list(article.revisions.values_list('number', flat=True)), [1, 2])
+        self.assertEqual(get_revision_text(article, 2), 'second\n')
+
+    def test_title_only_edit_records_no_revision(self):
+        article = self.create_article('body\n')
+        response = self.client.patch('/api/articles/%d/' % article.pk, {'title': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(article.revisions.count(), 1)
+
+    def test_existing_article_gets_baseline_revision(self):
+        article = Article.objects.create(title='title', author=self.user, content='legacy body\n')
+        response = self.client.patch('/api/articles/%d/' % article.pk, {'content': 'new body\n'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_revision_text(article, 1), 'legacy body\n')
+        self.assertEqual(get_revision_text(article, 2), 'new body\n')
+
+    def test_revision_endpoints(self):
+        article = self.create_article('first\n')
+        self.client.patch('/api/articles/%d/' % article.pk, {'content': 'first\nsecond\n'}, format='json')
+
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/articles/%d/revisions/' % article.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([revision['number'] for revision in response.data], [1, 2])
+        self.assertNotIn('content', response.data[0])
+
+        response = self.client.get('/api/articles/%d/revisions/1/' % article.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], 'first\n')
+        self.assertEqual(self.client.get('/api/articles/%d/revisions/2/' % article.pk).data['content'],
+                         'first\nsecond\n')
+
+        self.assertEqual(self.client.get('/api/articles/%d/revisions/3/' % article.pk).status_code, 404)
@@ -1,10 +1,18 @@
+from django.db import transaction
 from django.shortcuts import render
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import viewsets, serializers, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
 from articles.models import Article
 from articles.permissions import IsStaffOrAuthor
-from articles.serializers import ArticleSerializer
+from articles.revisions import get_revision_text, record_revision
+from articles.serializers import (ArticleSerializer, ArticleListSerializer, ArticleRevisionSerializer,
+                                  ArticleRevisionDetailSerializer)
+from common.export import NDJSONRenderer, export_response
 from common.signals import UserSignals
 
 
@@ -19,11 +27,26 @@ class ArticleViewSet(viewsets.ModelViewSet):
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsStaffOrAuthor()]
 
-        if self.action == 'retrieve':
+        if self.action in ['retrieve', 'revisions', 'revision']:
             return []
 
+        if self.action == 'export':
+            return [permissions.IsAdminUser()]
+
         return super().get_permissions()
 
+    # 列表不加载正文（包括旧的 content 列），只有获取详情和更新时才需要
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['retrieve', 'update', 'partial_update']:
+            return queryset.select_related('body')
+        return queryset.defer('content')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ArticleListSerializer
+        return super().get_serializer_class()
+
     @extend_schema(
         summary="创建文章",
         description="创建一篇文章",
@@ -40,7 +63,8 @@ class ArticleViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
-        UserSignals.on_user_article_created.send(sender=self.__class__,instance=self.request.user)
+        UserSignals.on_user_article_created.send(sender=self.__class__,instance=self.request.user,
+                                                 article=serializer.instance)
 
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -80,7 +104,52 @@ class ArticleViewSet(viewsets.ModelViewSet):
     def partial_update(self, request, *args, **kwargs):
         return super().partial_update(request, *args, **kwargs)
 
+    # 修改与对应的历史版本在同一事务中提交
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # 早于版本记录功能创建的文章没有历史版本，先把修改前的正文记为第一个版本
+        if not serializer.instance.revisions.exists():
+            record_revision(serializer.instance, serializer.instance.text, editor=serializer.instance.author)
+        serializer.save()
+        UserSignals.on_user_article_updated.send(sender=self.__class__,instance=self.request.user,
+                                                 article=serializer.instance)
+
 
     def destroy(self, request, *args, **kwargs):
         UserSignals.on_user_article_deleted.send(sender=self.__class__,instance=self.request.user)
-        return super().destroy(request, *args, **kwargs)
\ No newline at end of file
+        return super().destroy(request, *args, **kwargs)
+
+    @extend_schema(
+        summary="导出文章",
+        description="以 NDJSON 流式导出全部文章，仅管理员可用\n"
+                    "fields: 逗号分隔的字段列表，默认导出全部字段\n"
+                    "updated_after: ISO 8601 时间，仅导出在此之后更新的文章，用于增量同步",
+        responses={(200, 'application/x-ndjson'): str},
+    )
+    @action(detail=False, methods=['GET'], renderer_classes=[JSONRenderer, NDJSONRenderer])
+    def export(self, request):
+        return export_response(request, 'articles')
+
+    @extend_schema(
+        summary="获取文章历史版本列表",
+        description="获取一篇文章的全部历史版本（不含正文）",
+        responses=ArticleRevisionSerializer(many=True),
+    )
+    @action(detail=True, methods=['GET'])
+    def revisions(self, request, pk=None):
+        article = self.get_object()
+        return Response(ArticleRevisionSerializer(article.revisions.all(), many=True).data)
+
+    @extend_schema(
+        summary="获取文章历史版本",
+        description="获取一篇文章指定版本的正文",
+        responses=ArticleRevisionDetailSerializer,
+    )
+    @action(detail=True, methods=['GET'], url_path=r'revisions/(?P<number>\d+)')
+    def revision(self, request, pk=None, number=None):
+        article = self.get_object()
+        revision = article.revisions.filter(number=int(number)).first()
+        content = get_revision_text(article, int(number)) if revision else None
+        if content is None:
+            raise NotFound('Revision not found')
+        return Response(ArticleRevisionDetailSerializer(revision, context={'content': content}).data)
\ No newline at end of file
@@ -0,0 +1,193 @@
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+
+# NDJSON 导出：按主键区间分块读取，逐行输出，内存占用与表大小无关
+
+EXPORT_CHUNK_SIZE = 1000
+
+# 可导出的数据源：模型、允许导出的字段、增量同步使用的时间字段
+# resolvers 中的字段不直接从模型表读取，按块批量调用 resolver(ids) -> {id: value} 获取
+EXPORT_SOURCES = {
+    'articles': {
+        'model': 'articles.Article',
+        'fields': ('id',
+                   'title',
+                   'content',
+                   'created_time',
+                   'updated_time',
+                   'author',
+                   'like_count',
+                   'dislike_count',
+                   'star_count',
+                   'comment_count',
+                   'view_count'),
+        'updated_field': 'updated_time',
+        'resolvers': {
+            'content': 'articles.models.load_contents',
+        },
+    },
+    'users': {
+        'model': 'users.User',
+        'fields': ('id',
+                   'username',
+                   'nickname',
+                   'email',
+                   'is_staff',
+                   'is_superuser',
+                   'is_active',
+                   'last_login',
+                   'date_joined',
+                   'create_time',
+                   'update_time',
+                   'avatar_url',
+                   'article_count',
+                   'comment_count',
+                   'like_count',
+                   'star_count',
+                   'following_count',
+                   'follower_count'),
+        'updated_field': 'update_time',
+    },
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_fields(source, fields):
+    """
+    解析逗号分隔的字段列表，未指定时导出全部允许的字段，id 总是会被导出
+    """
+    allowed = EXPORT_SOURCES[source]['fields']
+    if not fields:
+        return list(allowed)
+
+    selected = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise ExportError('Unknown fields: ' + ', '.join(unknown))
+
+    if 'id' not in selected:
+        selected.insert(0, 'id')
+    # 去重并保持顺序
+    return list(dict.fromkeys(selected))
+
+
+def parse_updated_after(value):
+    if not value:
+        return None
+    try:
+        updated_after = parse_datetime(value)
+    except ValueError:
+        # 格式正确但日期本身不合法，例如 2024-02-30
+        updated_after = None
+    if updated_after is None:
+        raise ExportError('Invalid datetime: ' + value)
+    if timezone.is_naive(updated_after):
+        updated_after = timezone.make_aware(updated_after)
+    return updated_after
+
+
+def build_queryset(source, updated_after=None):
+    config = EXPORT_SOURCES[source]
+    queryset = apps.get_model(config['model'])._default_manager.all()
+    if updated_after is not None:
+        queryset = queryset.filter(**{config['updated_field'] + '__gt': updated_after})
+    return queryset
+
+
+def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE, resolvers=None):
+    """
+    以 id > last_id 的方式逐块读取，避免 OFFSET 扫描，也不会一次性把整张表载入内存
+    """
+    resolvers = {field: import_string(path) for field, path in (resolvers or {}).items() if field in fields}
+    queryset = queryset.order_by('pk').values(*[field for field in fields if field not in resolvers])
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        if resolvers:
+            ids = [row['id'] for row in rows]
+            for field, resolver in resolvers.items():
+                values = resolver(ids)
+                for row in rows:
+                    row[field] = values.get(row['id'])
+            # 保持与请求一致的字段顺序
+            rows = [{field: row[field] for field in fields} for row in rows]
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1]['id']
+
+
+def iter_ndjson(source, fields=None, updated_after=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    生成 NDJSON 文本行，fields / updated_after 需事先经过 parse_fields / parse_updated_after 校验
+    """
+    queryset = build_queryset(source, updated_after)
+    resolvers = EXPORT_SOURCES[source].get('resolvers')
+    for row in iter_rows(queryset, fields or parse_fields(source, None), chunk_size, resolvers):
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+async def aiter_ndjson(source, fields=None, updated_after=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    iter_ndjson 的异步版本，供 ASGI 使用：ASGI 下同步迭代器会被 Django 整体读入内存后才发送，
+    这里每次在同一线程中取出一块数据，保持流式输出
+    """
+    lines = iter_ndjson(source, fields, updated_after, chunk_size)
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, chunk_size)), thread_sensitive=True)
+    while True:
+        chunk = await next_chunk()
+        if not chunk:
+            return
+        yield chunk
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    使导出接口能够通过 Accept: application/x-ndjson 的内容协商，导出本身直接返回 StreamingHttpResponse，
+    这里只用于渲染错误信息等普通响应
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n').encode(self.charset)
+
+
+def export_response(request, source):
+    """
+    视图使用的流式导出响应，支持 ?fields=a,b,c 与 ?updated_after=<ISO 8601 时间>
+    WSGI 与 ASGI 下均为流式输出，内存占用与导出的数据量无关
+    """
+    query_params = request.GET
+    try:
+        fields = parse_fields(source, query_params.get('fields'))
+        updated_after = parse_updated_after(query_params.get('updated_after'))
+    except ExportError as e:
+        return JsonResponse({'message': 'Invalid Request: ' + str(e)}, status=400)
+
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = aiter_ndjson(source, fields, updated_after)
+    else:
+        content = iter_ndjson(source, fields, updated_after)
+    response = StreamingHttpResponse(content, content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="%s.ndjson"' % source
+    return response
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.export import (EXPORT_CHUNK_SIZE, EXPORT_SOURCES, ExportError, iter_ndjson, parse_fields,
+                           parse_updated_after)
+
+
+class Command(BaseCommand):
+    help = '以 NDJSON 格式分块导出文章或用户数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', choices=sorted(EXPORT_SOURCES))
+        parser.add_argument('--fields', help='逗号分隔的字段列表，默认导出全部字段')
+        parser.add_argument('--updated-after', help='ISO 8601 时间，仅导出在此之后更新的记录')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument('-o', '--output', help='输出文件，默认输出到标准输出')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        try:
+            fields = parse_fields(source, options['fields'])
+            updated_after = parse_updated_after(options['updated_after'])
+        except ExportError as e:
+            raise CommandError(str(e))
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+
+        lines = iter_ndjson(source, fields, updated_after, options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -1,3 +1,96 @@
+import datetime
+import io
+import json
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from common.export import (ExportError, aiter_ndjson, build_queryset, iter_ndjson, iter_rows, parse_fields,
+                           parse_updated_after)
+from users.models import User
+
 
 # Create your tests here.
+class ExportTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username='user%d' % i, password='password') for i in range(4)]
+
+    def test_parse_fields_defaults_to_all_fields(self):
+        self.assertIn('username', parse_fields('users', None))
+        self.assertNotIn('password', parse_fields('users', None))
+
+    def test_parse_fields_always_includes_id(self):
+        self.assertEqual(parse_fields('users', 'username, email,username'), ['id', 'username', 'email'])
+
+    def test_parse_fields_rejects_unknown_fields(self):
+        with self.assertRaises(ExportError):
+            parse_fields('users', 'username,password')
+
+    def test_parse_updated_after(self):
+        self.assertIsNone(parse_updated_after(''))
+        self.assertTrue(timezone.is_aware(parse_updated_after('2024-02-01T00:00:00')))
+        with self.assertRaises(ExportError):
+            parse_updated_after('yesterday')
+        with self.assertRaises(ExportError):
+            parse_updated_after('2024-02-30T00:00:00')
+
+    def test_iter_rows_at_exact_multiple_of_chunk_size(self):
+        # 两个满块 + 一次确认没有更多数据的查询
+        with self.assertNumQueries(3):
+            rows = list(iter_rows(User.objects.all(), ['id', 'username'], chunk_size=2))
+        self.assertEqual([row['id'] for row in rows], sorted(user.id for user in self.users))
+
+    def test_iter_rows_partial_last_chunk(self):
+        with self.assertNumQueries(2):
+            rows = list(iter_rows(User.objects.all(), ['id'], chunk_size=3))
+        self.assertEqual(len(rows), 4)
+
+    def test_updated_after_filter(self):
+        old = timezone.now() - datetime.timedelta(days=10)
+        User.objects.filter(pk__in=[user.pk for user in self.users[:3]]).update(update_time=old)
+
+        updated_after = old + datetime.timedelta(days=1)
+        self.assertEqual([user.pk for user in build_queryset('users', updated_after)], [self.users[3].pk])
+
+    def test_iter_ndjson_selected_fields(self):
+        lines = list(iter_ndjson('users', ['id', 'username'], chunk_size=3))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[0]), {'id': self.users[0].id, 'username': 'user0'})
+
+    def test_export_command_writes_to_stdout(self):
+        out = io.StringIO()
+        call_command('export_ndjson', 'users', fields='username', stdout=out)
+        self.assertEqual([json.loads(line)['username'] for line in out.getvalue().splitlines()],
+                         ['user0', 'user1', 'user2', 'user3'])
+
+    async def test_aiter_ndjson_yields_chunks(self):
+        chunks = [chunk async for chunk in aiter_ndjson('users', ['id', 'username'], chunk_size=3)]
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(len(''.join(chunks).splitlines()), 4)
+
+
+class ExportEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+
+    def test_non_admin_is_forbidden(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/users/export/').status_code, 403)
+
+    def test_admin_gets_streamed_ndjson(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/users/export/', {'fields': 'username'},
+                                   HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['username'] for line in lines], ['user', 'admin'])
+
+    def test_invalid_fields(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/articles/export/', {'fields': 'password'}).status_code, 400)
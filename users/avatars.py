@@ -0,0 +1,153 @@
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.db import connection
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from users.models import User
+from users.thumbnails import generate_thumbnails
+
+logger = logging.getLogger(__name__)
+
+AVATAR_ROOT = os.path.join(settings.MEDIA_ROOT, 'avatars')
+AVATAR_ORIGINAL_ROOT = os.path.join(AVATAR_ROOT, 'originals')
+AVATAR_THUMBNAIL_ROOT = os.path.join(AVATAR_ROOT, 'thumbnails')
+AVATAR_THUMBNAIL_URL = settings.MEDIA_URL + 'avatars/thumbnails/'
+
+original_storage = FileSystemStorage(location=AVATAR_ORIGINAL_ROOT)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# multipart 请求中边界、字段头等额外内容允许的长度
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class AvatarUploadHandler(TemporaryFileUploadHandler):
+    """
+    上传内容直接写入磁盘临时文件，超过 AVATAR_MAX_UPLOAD_SIZE 时立即中止读取
+    """
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.AVATAR_MAX_UPLOAD_SIZE
+        self.received = 0
+        self.exceeded = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # 请求体本身就超过限制时无需开始解析，返回空的 POST / FILES 交由视图返回 413
+        # 注意此处不能抛出 StopUpload，MultiPartParser 不会捕获该阶段的异常
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.exceeded = True
+            return QueryDict(), MultiValueDict()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.exceeded = True
+            self.file.close()
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 在多线程的服务进程中 fork 并不安全，子进程只执行不依赖 Django 的 users.thumbnails
+            _executor = ProcessPoolExecutor(max_workers=settings.AVATAR_THUMBNAIL_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _reset_executor(executor):
+    # 子进程异常退出（内存不足、解码器崩溃等）后进程池不可再用，需要重新创建
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def validate_image(uploaded_file):
+    """
+    检查上传的文件是否为图片且像素数不超过 AVATAR_MAX_PIXELS，返回错误信息，合法时返回 None
+    verify() 只检查文件头，尺寸需要单独限制，否则解码时会占用大量内存
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(uploaded_file) as image:
+            width, height = image.size
+            image.verify()
+    except Exception:
+        return 'Avatar is not a valid image'
+    finally:
+        uploaded_file.seek(0)
+    if width * height > settings.AVATAR_MAX_PIXELS:
+        return 'Avatar exceeds %d pixels' % settings.AVATAR_MAX_PIXELS
+    return None
+
+
+def save_original(user, uploaded_file):
+    ext = os.path.splitext(uploaded_file.name)[1].lower()[:10]
+    return original_storage.save('%d-%s%s' % (user.id, uuid.uuid4().hex, ext), uploaded_file)
+
+
+def submit_thumbnails(user, original_name, base_url):
+    """
+    在进程池中生成缩略图，完成后更新用户的 avatar_url，base_url 为缩略图目录的完整 URL
+    进程池损坏时重建并重试一次，仍然失败时抛出 BrokenProcessPool
+    """
+    # 上传编号记录在数据库中，多个服务进程之间也只有最近一次上传能更新头像
+    upload_id = uuid.uuid4().hex
+    User.objects.filter(pk=user.pk).update(avatar_upload_id=upload_id)
+
+    for attempt in range(2):
+        executor = _get_executor()
+        try:
+            future = executor.submit(generate_thumbnails,
+                                     original_storage.path(original_name),
+                                     AVATAR_THUMBNAIL_ROOT,
+                                     settings.AVATAR_THUMBNAIL_SIZES)
+            break
+        except BrokenProcessPool:
+            _reset_executor(executor)
+            if attempt:
+                User.objects.filter(pk=user.pk, avatar_upload_id=upload_id).update(avatar_upload_id='')
+                raise
+    future.add_done_callback(partial(_on_thumbnails_done, user.pk, upload_id, base_url))
+    return future
+
+
+def _on_thumbnails_done(user_id, upload_id, base_url, future):
+    try:
+        latest_upload = User.objects.filter(pk=user_id, avatar_upload_id=upload_id)
+        try:
+            filenames = future.result()
+        except Exception:
+            logger.exception('Failed to generate avatar thumbnails for user %s', user_id)
+            latest_upload.update(avatar_upload_id='')
+            return
+
+        # 使用最大尺寸的缩略图作为头像，其余尺寸将文件名中的尺寸替换即可得到；
+        # 带上传编号条件的单条 UPDATE 保证原子性，较早的上传不会覆盖较新的头像
+        filename = filenames[max(filenames)]
+        latest_upload.update(avatar_url=base_url + filename,
+                             avatar_upload_id='',
+                             update_time=timezone.now())
+    except Exception:
+        logger.exception('Failed to update avatar_url for user %s', user_id)
+    finally:
+        # 回调运行在进程池的管理线程中，不会经过请求结束时的连接清理
+        connection.close()
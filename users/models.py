@@ -16,6 +16,8 @@ class User(AbstractUser):
     is_superuser = models.BooleanField(default=False)
 
     avatar_url = models.URLField(max_length=500, blank=True)
+    # 最近一次头像上传的编号，缩略图生成完成时只有编号一致才会更新 avatar_url
+    avatar_upload_id = models.CharField(max_length=32, blank=True, editable=False)
 
     article_count = models.IntegerField(default=0)
     comment_count = models.IntegerField(default=0)
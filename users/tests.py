@@ -0,0 +1,175 @@
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from users import avatars
+from users.models import User
+from users.thumbnails import generate_thumbnails
+
+
+# Create your tests here.
+def make_png(size=(20, 20), color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class TempDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+
+class ThumbnailTests(TempDirMixin, SimpleTestCase):
+    def test_generate_thumbnails(self):
+        original = os.path.join(self.tmp_dir, 'original.png')
+        with open(original, 'wb') as f:
+            f.write(make_png((300, 200)))
+        output_dir = os.path.join(self.tmp_dir, 'thumbnails')
+
+        filenames = generate_thumbnails(original, output_dir, (64, 256))
+
+        # 所有尺寸共用同一个内容哈希
+        content_hash = filenames[64].rsplit('-', 1)[0]
+        self.assertEqual(filenames, {64: '%s-64.jpg' % content_hash, 256: '%s-256.jpg' % content_hash})
+        for size, filename in filenames.items():
+            with Image.open(os.path.join(output_dir, filename)) as image:
+                self.assertEqual(image.size, (size, size))
+
+        # 同一原图再次生成时文件名不变
+        self.assertEqual(generate_thumbnails(original, output_dir, (64, 256)), filenames)
+
+
+class AvatarUploadTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.client.force_authenticate(self.user)
+
+        storage_patcher = mock.patch.object(avatars, 'original_storage', FileSystemStorage(location=self.tmp_dir))
+        storage_patcher.start()
+        self.addCleanup(storage_patcher.stop)
+        submit_patcher = mock.patch('users.views.submit_thumbnails')
+        self.submit_thumbnails = submit_patcher.start()
+        self.addCleanup(submit_patcher.stop)
+
+    def upload(self, content, name='avatar.png'):
+        return self.client.post('/api/users/avatar/', {'avatar': SimpleUploadedFile(name, content)},
+                                format='multipart')
+
+    def test_upload_image(self):
+        response = self.upload(make_png())
+        self.assertEqual(response.status_code, 202)
+        self.submit_thumbnails.assert_called_once()
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 1)
+
+    @override_settings(AVATAR_MAX_UPLOAD_SIZE=10)
+    def test_request_body_too_large(self):
+        response = self.upload(b'0' * (avatars.MULTIPART_OVERHEAD + 100))
+        self.assertEqual(response.status_code, 413)
+        self.submit_thumbnails.assert_not_called()
+
+    @override_settings(AVATAR_MAX_UPLOAD_SIZE=1000)
+    def test_streamed_file_too_large(self):
+        response = self.upload(b'0' * 5000)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_not_an_image(self):
+        response = self.upload(b'not an image', name='avatar.txt')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    @override_settings(AVATAR_MAX_PIXELS=100)
+    def test_image_too_many_pixels(self):
+        response = self.upload(make_png((20, 20)))
+        self.assertEqual(response.status_code, 400)
+        self.submit_thumbnails.assert_not_called()
+
+    def test_missing_file(self):
+        response = self.client.post('/api/users/avatar/', {}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_anonymous_is_rejected(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.upload(make_png()).status_code, 403)
+
+
+@mock.patch('users.avatars.connection')
+class ThumbnailCallbackTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password', avatar_upload_id='latest',
+                                             avatar_url='http://testserver/old.jpg')
+
+    def done(self, upload_id, result=None, exception=None):
+        future = Future()
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+        avatars._on_thumbnails_done(self.user.pk, upload_id, 'http://testserver/media/avatars/thumbnails/', future)
+        self.user.refresh_from_db()
+
+    def test_latest_upload_updates_avatar_url(self, connection):
+        self.done('latest', {64: 'hash-64.jpg', 256: 'hash-256.jpg'})
+        self.assertEqual(self.user.avatar_url, 'http://testserver/media/avatars/thumbnails/hash-256.jpg')
+        self.assertEqual(self.user.avatar_upload_id, '')
+
+    def test_stale_upload_does_not_overwrite(self, connection):
+        self.done('stale', {64: 'stale-64.jpg', 256: 'stale-256.jpg'})
+        self.assertEqual(self.user.avatar_url, 'http://testserver/old.jpg')
+        self.assertEqual(self.user.avatar_upload_id, 'latest')
+
+    def test_failed_upload_clears_token(self, connection):
+        self.done('latest', exception=OSError('broken image'))
+        self.assertEqual(self.user.avatar_url, 'http://testserver/old.jpg')
+        self.assertEqual(self.user.avatar_upload_id, '')
+
+
+class SubmitThumbnailsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password')
+
+    def broken_executor(self):
+        executor = mock.Mock()
+        executor.submit.side_effect = BrokenProcessPool()
+        return executor
+
+    def test_broken_pool_is_recreated(self):
+        working = mock.Mock()
+        with mock.patch.object(avatars, '_get_executor', side_effect=[self.broken_executor(), working]):
+            future = avatars.submit_thumbnails(self.user, 'original.png', 'http://testserver/')
+        self.assertIs(future, working.submit.return_value)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.avatar_upload_id, '')
+
+    def test_broken_pool_clears_token(self):
+        with mock.patch.object(avatars, '_get_executor', side_effect=[self.broken_executor(),
+                                                                       self.broken_executor()]):
+            with self.assertRaises(BrokenProcessPool):
+                avatars.submit_thumbnails(self.user, 'original.png', 'http://testserver/')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_upload_id, '')
+
+
+class AvatarThumbnailViewTests(TempDirMixin, SimpleTestCase):
+    def test_cache_headers(self):
+        with open(os.path.join(self.tmp_dir, 'hash-64.jpg'), 'wb') as f:
+            f.write(b'jpeg')
+        with mock.patch('users.views.AVATAR_THUMBNAIL_ROOT', self.tmp_dir):
+            response = self.client.get('/media/avatars/thumbnails/hash-64.jpg')
+        self.assertEqual(response.status_code, 200)
+        cache_control = {value.strip() for value in response['Cache-Control'].split(',')}
+        self.assertTrue({'public', 'immutable', 'max-age=31536000'} <= cache_control)
@@ -0,0 +1,44 @@
+import hashlib
+import io
+import os
+
+# 该模块在进程池的子进程中执行，不依赖 Django
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def generate_thumbnails(original_path, output_dir, sizes):
+    """
+    为头像原图生成若干正方形缩略图，返回 {size: filename}
+    同一次上传的所有尺寸共用原图的内容哈希，文件名为 <hash>-<size>.jpg，可由任一尺寸推导出其他尺寸
+    """
+    from PIL import Image, ImageOps
+
+    content_hash = _file_hash(original_path)
+    with Image.open(original_path) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+
+        os.makedirs(output_dir, exist_ok=True)
+        filenames = {}
+        for size in sizes:
+            filename = '%s-%d.jpg' % (content_hash, size)
+            path = os.path.join(output_dir, filename)
+            # 相同原图生成的文件相同，已存在时无需重复写入
+            if not os.path.exists(path):
+                thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                buffer = io.BytesIO()
+                thumbnail.save(buffer, format='JPEG', quality=85, optimize=True)
+
+                tmp_path = '%s.%d.tmp' % (path, os.getpid())
+                with open(tmp_path, 'wb') as f:
+                    f.write(buffer.getvalue())
+                os.replace(tmp_path, path)
+            filenames[size] = filename
+    return filenames
@@ -1,13 +1,22 @@
 import json
+from concurrent.futures.process import BrokenProcessPool
 
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.hashers import make_password
 from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import viewsets, mixins, serializers, permissions
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 
+from common.export import NDJSONRenderer, export_response
 from common.signals import UserSignals
+from users.avatars import (AVATAR_THUMBNAIL_ROOT, AVATAR_THUMBNAIL_URL, AvatarUploadHandler, save_original,
+                           submit_thumbnails, validate_image)
 from users.models import User
 from users.permissions import IsStaffOrAuthor
 from users.serializers import UserSerializer, UserRequestSerializer
@@ -26,8 +35,20 @@ class UserViewSet(mixins.RetrieveModelMixin,
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
             return [permissions.IsAuthenticated, IsStaffOrAuthor]
+        if self.action == 'export':
+            return [permissions.IsAdminUser()]
+        if self.action == 'avatar':
+            return [permissions.IsAuthenticated()]
         return super().get_permissions()
 
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        # 必须在请求体被解析之前替换上传处理器，使上传内容直接流式写入磁盘
+        if self.action == 'avatar':
+            self.avatar_upload_handler = AvatarUploadHandler(request)
+            request.upload_handlers = [self.avatar_upload_handler]
+        return drf_request
+
     @extend_schema(
         description='用户登录接口\n完成登录后，会在返回的cookie中携带sessionid, 作为下次登录的凭证，后续请求时需要携带此cookie',
         summary='用户登录',
@@ -94,4 +115,56 @@ class UserViewSet(mixins.RetrieveModelMixin,
             UserSignals.on_user_registered.send(sender=user)
             return JsonResponse({'message': 'Register Successful'}, status=200)
         else:
-            return JsonResponse({'message': 'Invalid Request: ' + str(user_serializer.errors)}, status=400)
\ No newline at end of file
+            return JsonResponse({'message': 'Invalid Request: ' + str(user_serializer.errors)}, status=400)
+
+    @extend_schema(
+        summary='导出用户',
+        description='以 NDJSON 流式导出全部用户，仅管理员可用\n'
+                    'fields: 逗号分隔的字段列表，默认导出全部字段\n'
+                    'updated_after: ISO 8601 时间，仅导出在此之后更新的用户，用于增量同步',
+        responses={(200, 'application/x-ndjson'): str},
+    )
+    @action(detail=False, methods=['GET'], renderer_classes=[JSONRenderer, NDJSONRenderer])
+    def export(self, request):
+        return export_response(request, 'users')
+
+    @extend_schema(
+        summary='上传头像',
+        description='上传当前登录用户的头像，使用 multipart/form-data，文件字段名为 avatar\n'
+                    '缩略图在后台生成，完成后自动更新 avatar_url\n'
+                    'avatar_url 指向最大尺寸的缩略图 <hash>-<size>.jpg，将 size 替换为其他尺寸即可得到对应的缩略图，'
+                    '可用尺寸：%s' % ', '.join(str(size) for size in settings.AVATAR_THUMBNAIL_SIZES),
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {'avatar': {'type': 'string', 'format': 'binary'}},
+            }
+        },
+    )
+    @action(detail=False, methods=['POST'], parser_classes=[MultiPartParser])
+    def avatar(self, request):
+        uploaded_file = request.FILES.get('avatar')
+        if self.avatar_upload_handler.exceeded:
+            return JsonResponse({'message': 'Invalid Request: Avatar exceeds %d bytes'
+                                            % settings.AVATAR_MAX_UPLOAD_SIZE}, status=413)
+        if uploaded_file is None:
+            return JsonResponse({'message': 'Invalid Request: Missing avatar file'}, status=400)
+        error = validate_image(uploaded_file)
+        if error:
+            return JsonResponse({'message': 'Invalid Request: ' + error}, status=400)
+
+        original_name = save_original(request.user, uploaded_file)
+        try:
+            submit_thumbnails(request.user, original_name, request.build_absolute_uri(AVATAR_THUMBNAIL_URL))
+        except BrokenProcessPool:
+            return JsonResponse({'message': 'Avatar processing is unavailable, please try again later'}, status=503)
+        return JsonResponse({'message': 'Avatar Uploaded, processing'}, status=202)
+
+
+def avatar_thumbnail(request, path):
+    """
+    提供头像缩略图，文件名包含内容哈希，内容不会变化
+    """
+    response = serve(request, path, document_root=AVATAR_THUMBNAIL_ROOT)
+    patch_cache_control(response, public=True, max_age=settings.AVATAR_CACHE_MAX_AGE, immutable=True)
+    return response
\ No newline at end of file